@@ -1,10 +1,14 @@
 import os
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
-from models.database import create_tables
-from routes import chat, websocket
+from models.database import create_tables, migrate_database
+from routes import chat, websocket, maintenance
+from services.rag_client import rag_client
+from services.prompt_builder import prompt_builder
+from services.maintenance_service import maintenance_service
 
 # 환경변수 로드
 load_dotenv()
@@ -28,6 +32,7 @@ app.add_middleware(
 # 라우터 등록
 app.include_router(chat.router, prefix="/api", tags=["chat"])
 app.include_router(websocket.router, prefix="/api", tags=["websocket"])
+app.include_router(maintenance.router, prefix="/api", tags=["maintenance"])
 
 @app.on_event("startup")
 async def startup_event():
@@ -38,6 +43,10 @@ async def startup_event():
     create_tables()
     print("✅ 데이터베이스 테이블 생성 완료")
     
+    # 토크나이저 로드 (요청 처리 중 인코딩 파일 다운로드 방지)
+    if await asyncio.to_thread(prompt_builder.load_encoding) is not None:
+        print("✅ 토크나이저 로드 완료")
+    
     # RAG 인덱스 존재 확인
     rag_index_dir = os.getenv("RAG_INDEX_DIR", "./data/faiss_index")
     index_path = os.path.join(rag_index_dir, "faiss.index")
@@ -47,8 +56,21 @@ async def startup_event():
     else:
         print("✅ RAG 인덱스 확인 완료")
     
+    # 채팅 히스토리 정리 작업 시작
+    if maintenance_service.start():
+        print("✅ DB 정리 작업 시작")
+    
     print("🎉 서버 시작 완료!")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """애플리케이션 종료 시 실행"""
+    # RAG 사이드카 연결 종료
+    await rag_client.close()
+    
+    # 채팅 히스토리 정리 작업 중지
+    await maintenance_service.stop()
+
 @app.get("/")
 async def root():
     """루트 엔드포인트"""
@@ -67,16 +89,63 @@ async def health_check():
     """헬스 체크 엔드포인트"""
     return {"status": "healthy"}
 
+def start_rag_sidecar(socket_path: str):
+    """RAG 사이드카 프로세스 시작 후 모델 로드와 소켓 바인딩이 끝날 때까지 대기"""
+    import time
+    import multiprocessing
+    from rag_sidecar import run_sidecar
+    
+    # 이전 실행에서 남은 소켓 파일이 있으면 준비 완료로 오인하지 않도록 먼저 삭제
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=run_sidecar, args=(socket_path, ready), daemon=True)
+    process.start()
+    
+    timeout = float(os.getenv("RAG_SIDECAR_START_TIMEOUT", "120"))
+    deadline = time.monotonic() + timeout
+    while not ready.wait(0.2):
+        if not process.is_alive():
+            raise RuntimeError("RAG 사이드카 프로세스가 시작되지 못했습니다.")
+        if time.monotonic() > deadline:
+            process.terminate()
+            raise RuntimeError("RAG 사이드카 시작 시간이 초과되었습니다.")
+    
+    return process
+
 if __name__ == "__main__":
     import uvicorn
     
     host = os.getenv("SERVER_HOST", "0.0.0.0")
     port = int(os.getenv("SERVER_PORT", "8000"))
+    workers = int(os.getenv("SERVER_WORKERS", "1"))
     
-    uvicorn.run(
-        "main:app",
-        host=host,
-        port=port,
-        reload=True,  # 개발 모드
-        log_level="info"
-    )
\ No newline at end of file
+    # 최초 1회 마이그레이션 (VACUUM 등 쓰기 락을 오래 잡으므로 워커 시작 전에 한 번만)
+    migrate_database()
+    
+    if workers > 1:
+        # 프로덕션 모드: 임베딩/검색은 사이드카 하나가 담당하고 워커는 요청 처리만
+        socket_path = os.getenv("RAG_SIDECAR_SOCKET", "/tmp/rag_sidecar.sock")
+        os.environ["RAG_SIDECAR_SOCKET"] = socket_path
+        sidecar = start_rag_sidecar(socket_path)
+        
+        try:
+            uvicorn.run(
+                "main:app",
+                host=host,
+                port=port,
+                workers=workers,
+                log_level="info"
+            )
+        finally:
+            sidecar.terminate()
+            sidecar.join()
+    else:
+        uvicorn.run(
+            "main:app",
+            host=host,
+            port=port,
+            reload=True,  # 개발 모드
+            log_level="info"
+        )
\ No newline at end of file
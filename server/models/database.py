@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
+from sqlalchemy import create_engine, event, inspect, Column, Integer, String, DateTime, Text, Index
+from sqlalchemy.exc import OperationalError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -12,6 +13,15 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/chat_history.db")
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL 모드로 읽기/쓰기 동시성 확보, 새 DB는 incremental vacuum 사용
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
 Base = declarative_base()
 
 class ChatHistoryDB(Base):
@@ -23,6 +33,38 @@ class ChatHistoryDB(Base):
     refined_text = Column(Text)
     reply_text = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # 세션별 커서 페이지네이션용 (created_at, id) 인덱스
+    __table_args__ = (
+        Index("ix_chat_history_session_created_id", "session_id", "created_at", "id"),
+    )
+
+class ChatSessionDB(Base):
+    """세션별 히스토리 버전 (히스토리가 바뀔 때마다 증가, ETag 생성용)"""
+    __tablename__ = "chat_sessions"
+    
+    session_id = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    # 저장할 때마다 갱신되므로 보존 기간 정리에서 만료 세션 조회에 사용
+    updated_at = Column(DateTime, default=datetime.utcnow, index=True)
+    # 히스토리 창 밖으로 밀려난 턴의 요약 (워커 간 공유)
+    summary = Column(Text)
+    summarized_until_id = Column(Integer, default=0)
+
+class MaintenanceRunDB(Base):
+    """DB 정리 작업 실행 기록 (워커 간 공유)"""
+    __tablename__ = "maintenance_runs"
+    
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    sessions_removed = Column(Integer, default=0)
+    rows_removed = Column(Integer, default=0)
+    # 누적 합계 (오래된 실행 기록을 지워도 전체 합계 유지)
+    sessions_removed_total = Column(Integer, default=0)
+    rows_removed_total = Column(Integer, default=0)
+    duration_ms = Column(Integer, default=0)
+    db_bytes = Column(Integer, default=0)
+    wal_bytes = Column(Integer, default=0)
 
 def get_db():
     db = SessionLocal()
@@ -32,4 +74,49 @@ def get_db():
         db.close()
 
 def create_tables():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
+    
+    # 기존 테이블에 새로 추가된 인덱스 생성
+    for index in ChatHistoryDB.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+def migrate_database():
+    """최초 1회 필요한 DB 마이그레이션 실행
+    
+    워커마다 실행하면 서로 쓰기 락을 기다리다 시작에 실패하므로
+    워커를 띄우기 전 부모 프로세스(main.py)에서 한 번만 호출
+    """
+    has_sessions_table = inspect(engine).has_table(ChatSessionDB.__tablename__)
+    create_tables()
+    
+    # chat_sessions 테이블이 새로 생긴 경우에만 기존 세션 백필
+    # (버전 기록이 없으면 ETag가 행 삭제 후에도 바뀌지 않음)
+    if not has_sessions_table:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "INSERT INTO chat_sessions (session_id, version, updated_at, summarized_until_id) "
+                "SELECT session_id, 1, MAX(created_at), 0 FROM chat_history "
+                "WHERE session_id IS NOT NULL "
+                "GROUP BY session_id"
+            )
+    
+    if engine.dialect.name == "sqlite":
+        _migrate_auto_vacuum()
+
+def _migrate_auto_vacuum():
+    """기존 SQLite 파일을 auto_vacuum=INCREMENTAL로 전환 (최초 1회 VACUUM)
+    
+    auto_vacuum 설정은 새 파일이나 VACUUM 이후에만 적용되므로
+    auto_vacuum이 NONE(0)인 기존 파일은 한 번 전체 VACUUM이 필요함
+    """
+    with engine.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() != 0:
+            return
+        
+        print("🧹 SQLite auto_vacuum=INCREMENTAL 전환을 위해 VACUUM 실행 중...")
+        try:
+            conn.commit()
+            conn.connection.executescript("PRAGMA auto_vacuum=INCREMENTAL; VACUUM;")
+        except OperationalError as e:
+            # 다른 프로세스가 DB를 사용 중인 경우 등
+            print(f"⚠️  VACUUM 실패 (다음 시작 시 다시 시도): {e}")
\ No newline at end of file
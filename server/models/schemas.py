@@ -21,6 +21,11 @@ class StreamingResponse(BaseModel):
     content: str
     session_id: str
 
+class HistorySummary(BaseModel):
+    """히스토리 창 밖으로 밀려난 턴의 요약 (chat_sessions에 저장)"""
+    summarized_until_id: int = 0
+    lines: List[str] = []
+
 class ChatHistory(BaseModel):
     id: Optional[int] = None
     session_id: str
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+RAG 사이드카 서버
+임베딩 모델과 FAISS 인덱스를 한 프로세스에만 로드하고,
+유닉스 소켓으로 들어오는 모든 웹 워커의 검색 요청을 모아서 일괄 처리합니다.
+
+요청/응답은 한 줄에 하나씩 JSON으로 주고받습니다.
+    요청: {"id": 1, "query": "...", "k": 3}
+    응답: {"id": 1, "results": [["원문", "교정문", 0.93], ...]} 또는 {"id": 1, "error": "..."}
+"""
+
+import os
+import json
+import signal
+import asyncio
+from dotenv import load_dotenv
+
+DEFAULT_SOCKET_PATH = "/tmp/rag_sidecar.sock"
+
+class RAGSidecar:
+    def __init__(self, socket_path: str, ready_event=None):
+        self.socket_path = socket_path
+        self.ready_event = ready_event  # 소켓 바인딩 후 set (multiprocessing.Event)
+        self.batch_size = int(os.getenv("RAG_BATCH_SIZE", "32"))
+        self.batch_wait = int(os.getenv("RAG_BATCH_WAIT_MS", "5")) / 1000
+        self.queue: asyncio.Queue = None
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """워커 연결 처리 - 요청을 배치 큐에 넣기만 하고 응답은 배치 루프에서 전송"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                try:
+                    request = json.loads(line)
+                    await self.queue.put((request["id"], request["query"], int(request.get("k", 3)), writer))
+                except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+                    continue
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def batch_loop(self):
+        """큐에 쌓인 요청을 묶어서 한 번에 임베딩 및 검색"""
+        from services.rag_service import rag_service
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            batch = [await self.queue.get()]
+
+            # 최대 batch_wait 동안 추가 요청을 모음
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            queries = [query for _, query, _, _ in batch]
+            max_k = max(k for _, _, k, _ in batch)
+
+            try:
+                batch_results = await loop.run_in_executor(
+                    None, rag_service.search_similar_examples_batch, queries, max_k
+                )
+                responses = [
+                    {"id": request_id, "results": results[:k]}
+                    for (request_id, _, k, _), results in zip(batch, batch_results)
+                ]
+            except Exception as e:
+                responses = [{"id": request_id, "error": str(e)} for request_id, _, _, _ in batch]
+
+            writers = set()
+            for (_, _, _, writer), response in zip(batch, responses):
+                if writer.is_closing():
+                    continue
+                writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+                writers.add(writer)
+
+            for writer in writers:
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    pass
+
+    async def serve(self):
+        """모델과 인덱스를 미리 로드한 뒤 유닉스 소켓 서버 실행"""
+        from services.rag_service import rag_service
+
+        rag_service.load_model()
+        try:
+            rag_service.load_index()
+        except FileNotFoundError as e:
+            print(f"⚠️  {e}")
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        # SIGTERM/SIGINT에서도 소켓 파일을 정리하도록 종료 이벤트로 처리
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+
+        self.queue = asyncio.Queue()
+        server = await asyncio.start_unix_server(self.handle_client, path=self.socket_path)
+        batcher = asyncio.create_task(self.batch_loop())
+        print(f"✅ RAG 사이드카 시작: {self.socket_path}")
+
+        if self.ready_event is not None:
+            self.ready_event.set()
+
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            batcher.cancel()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+def run_sidecar(socket_path: str = None, ready_event=None):
+    """RAG 사이드카 실행"""
+    load_dotenv()
+    socket_path = socket_path or os.getenv("RAG_SIDECAR_SOCKET", DEFAULT_SOCKET_PATH)
+
+    asyncio.run(RAGSidecar(socket_path, ready_event).serve())
+
+if __name__ == "__main__":
+    run_sidecar()
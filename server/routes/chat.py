@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response
 from sqlalchemy.orm import Session
 from models.database import get_db
 from models.schemas import ChatRequest, ChatResponse
 from services.llm_service import llm_service
 from services.chat_service import chat_service
+from services.prompt_builder import prompt_builder
 
 router = APIRouter()
 
@@ -19,22 +22,23 @@ async def chat_endpoint(
         # 세션 ID 처리
         session_id = request.session_id or chat_service.create_session_id()
         
-        # 채팅 히스토리 조회 (컨텍스트용)
-        chat_history = chat_service.get_recent_history_for_context(db, session_id, limit=5)
+        # 채팅 히스토리 조회 (컨텍스트용, 오래된 턴은 프롬프트 빌더가 요약)
+        chat_history = chat_service.get_recent_history_for_context(db, session_id, limit=chat_service.max_history)
+        summary = chat_service.get_history_summary(db, session_id)
         
-        # 1단계: 문장 교정
-        refined_text = await llm_service.refine_text(request.message, request.style)
-        
-        # 2단계: 응답 생성
-        reply_text = await llm_service.generate_reply(refined_text, request.style, chat_history)
+        # 문장 교정 및 응답 생성 (통합 모드에서는 한 번의 호출)
+        refined_text, reply_text = await llm_service.refine_and_reply(
+            request.message, request.style, chat_history, summary
+        )
         
-        # 히스토리 저장
+        # 히스토리 및 갱신된 요약 저장
         chat_service.save_chat_history(
             db=db,
             session_id=session_id,
             original_text=request.message,
             refined_text=refined_text,
-            reply_text=reply_text
+            reply_text=reply_text,
+            summary=summary
         )
         
         return ChatResponse(
@@ -49,13 +53,36 @@ async def chat_endpoint(
 @router.get("/chat/history/{session_id}")
 async def get_chat_history(
     session_id: str,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """
-    채팅 히스토리 조회
+    채팅 히스토리 조회 - cursor로 이전 페이지 조회, 변경이 없으면 304 반환
     """
     try:
-        history = chat_service.get_chat_history(db, session_id)
-        return {"session_id": session_id, "history": history}
+        # 세션 버전만 확인해서 변경이 없으면 히스토리를 읽지 않음
+        etag, session_exists = chat_service.make_history_etag(db, session_id, limit or chat_service.max_history, cursor)
+        if if_none_match:
+            candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+            if ("*" in candidates and session_exists) or etag.removeprefix("W/") in candidates:
+                return Response(status_code=304, headers={"ETag": etag})
+        
+        history, next_cursor = chat_service.get_chat_history_page(db, session_id, limit, cursor)
+        body = json.dumps(
+            {"session_id": session_id, "history": history, "next_cursor": next_cursor},
+            ensure_ascii=False
+        )
+        return Response(content=body, media_type="application/json", headers={"ETag": etag})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"히스토리 조회 중 오류가 발생했습니다: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"히스토리 조회 중 오류가 발생했습니다: {str(e)}")
+
+@router.get("/chat/prompt-stats")
+async def get_prompt_stats():
+    """
+    단계별 프롬프트 토큰 통계 조회 (예산 튜닝용)
+    """
+    return prompt_builder.get_stats()
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from models.database import get_db
+from services.maintenance_service import maintenance_service
+
+router = APIRouter()
+
+@router.get("/maintenance/stats")
+async def maintenance_stats(db: Session = Depends(get_db)):
+    """
+    DB 정리 작업 현황 조회 (삭제 행 수, 파일 크기 추이)
+    """
+    try:
+        return maintenance_service.get_stats(db)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"정리 작업 현황 조회 중 오류가 발생했습니다: {str(e)}")
@@ -1,37 +1,160 @@
+import os
 import json
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.orm import Session
-from models.database import get_db, SessionLocal
-from models.schemas import ChatRequest, StreamingResponse, StyleType
+import time
+import asyncio
+from typing import Dict, Optional
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from models.database import SessionLocal
+from models.schemas import StyleType
 from services.llm_service import llm_service
 from services.chat_service import chat_service
 
 router = APIRouter()
 
+# WebSocket 종료 코드
+WS_CLOSE_NORMAL = 1000          # 유휴 시간 초과
+WS_CLOSE_POLICY_VIOLATION = 1008  # IP별 연결 수 초과
+WS_CLOSE_TRY_AGAIN_LATER = 1013   # 전체 연결 수 초과
+
+class ConnectionState:
+    """연결별 상태 (연결 수가 많아도 메모리를 적게 쓰도록 __slots__ 사용)"""
+    __slots__ = ("websocket", "client_ip", "connected_at", "last_activity", "busy")
+
+    def __init__(self, websocket: WebSocket, client_ip: str):
+        now = time.monotonic()
+        self.websocket = websocket
+        self.client_ip = client_ip
+        self.connected_at = now
+        self.last_activity = now  # 마지막 채팅 메시지 수신 시각
+        self.busy = False         # 턴 처리 중 여부
+
 class ConnectionManager:
+    """워커별 WebSocket 연결 관리
+
+    반쯤 끊어진 소켓은 uvicorn의 프로토콜 ping/pong(기본 20초)이 정리하고,
+    여기서는 유휴 연결 종료와 연결 수 제한만 담당.
+    WS_MAX_CONNECTIONS / WS_MAX_CONNECTIONS_PER_IP는 서버 전체 기준이며
+    SERVER_WORKERS로 나눈 값을 워커별 제한으로 사용 (IP별 제한은 워커 간 분산에 따라 근사치)
+    """
+
     def __init__(self):
-        self.active_connections: list[WebSocket] = []
+        workers = max(1, int(os.getenv("SERVER_WORKERS", "1")))
+        self.max_connections = max(1, int(os.getenv("WS_MAX_CONNECTIONS", "10000")) // workers)
+        self.max_connections_per_ip = max(1, -(-int(os.getenv("WS_MAX_CONNECTIONS_PER_IP", "20")) // workers))
+        self.idle_check_interval = float(os.getenv("WS_IDLE_CHECK_INTERVAL", "30"))
+        self.idle_timeout = float(os.getenv("WS_IDLE_TIMEOUT", "900"))
+        self.send_timeout = float(os.getenv("WS_SEND_TIMEOUT", "10"))
+
+        # id(websocket) -> 연결 상태 (WebSocket 객체는 해시 불가)
+        self.active_connections: Dict[int, ConnectionState] = {}
+        self.connections_per_ip: Dict[str, int] = {}
+
+        self.peak_connections = 0
+        self.rejected_total = 0
+        self.idle_closed_total = 0
 
-    async def connect(self, websocket: WebSocket):
+        self._sweeper_task: Optional[asyncio.Task] = None
+
+    async def connect(self, websocket: WebSocket) -> Optional[ConnectionState]:
+        """연결 수락 및 등록 (연결 제한 초과 시 종료 코드와 함께 닫고 None 반환)"""
         await websocket.accept()
-        self.active_connections.append(websocket)
+
+        client_ip = websocket.client.host if websocket.client else "unknown"
+
+        if len(self.active_connections) >= self.max_connections:
+            self.rejected_total += 1
+            await websocket.close(code=WS_CLOSE_TRY_AGAIN_LATER, reason="server busy")
+            return None
+
+        if self.connections_per_ip.get(client_ip, 0) >= self.max_connections_per_ip:
+            self.rejected_total += 1
+            await websocket.close(code=WS_CLOSE_POLICY_VIOLATION, reason="too many connections")
+            return None
+
+        state = ConnectionState(websocket, client_ip)
+        self.active_connections[id(websocket)] = state
+        self.connections_per_ip[client_ip] = self.connections_per_ip.get(client_ip, 0) + 1
+        self.peak_connections = max(self.peak_connections, len(self.active_connections))
+
+        # 유휴 연결 정리 작업은 워커당 하나만 실행
+        if self._sweeper_task is None or self._sweeper_task.done():
+            self._sweeper_task = asyncio.create_task(self._sweep_loop())
+
+        return state
 
     def disconnect(self, websocket: WebSocket):
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        state = self.active_connections.pop(id(websocket), None)
+        if state is None:
+            return
+
+        remaining = self.connections_per_ip.get(state.client_ip, 1) - 1
+        if remaining > 0:
+            self.connections_per_ip[state.client_ip] = remaining
+        else:
+            self.connections_per_ip.pop(state.client_ip, None)
+
+    def touch(self, state: ConnectionState):
+        """메시지 수신 기록"""
+        state.last_activity = time.monotonic()
 
     async def send_message(self, websocket: WebSocket, message: dict):
         await websocket.send_text(json.dumps(message, ensure_ascii=False))
 
+    def get_stats(self) -> Dict:
+        """연결 현황 조회"""
+        return {
+            "active_connections": len(self.active_connections),
+            "busy_connections": sum(1 for state in self.active_connections.values() if state.busy),
+            "unique_ips": len(self.connections_per_ip),
+            "peak_connections": self.peak_connections,
+            "rejected_total": self.rejected_total,
+            "idle_closed_total": self.idle_closed_total,
+            "limits": {
+                "max_connections_per_worker": self.max_connections,
+                "max_connections_per_ip_per_worker": self.max_connections_per_ip,
+                "idle_timeout": self.idle_timeout
+            }
+        }
+
+    async def _sweep_loop(self):
+        """주기적으로 유휴 연결 종료"""
+        while self.active_connections:
+            await asyncio.sleep(self.idle_check_interval)
+
+            now = time.monotonic()
+            tasks = []
+            for state in list(self.active_connections.values()):
+                if not state.busy and now - state.last_activity > self.idle_timeout:
+                    self.idle_closed_total += 1
+                    tasks.append(self._close(state, WS_CLOSE_NORMAL, "idle timeout"))
+
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _close(self, state: ConnectionState, code: int, reason: str):
+        self.disconnect(state.websocket)
+        try:
+            await asyncio.wait_for(state.websocket.close(code=code, reason=reason), self.send_timeout)
+        except Exception:
+            pass
+
 manager = ConnectionManager()
 
+@router.get("/ws/stats")
+async def websocket_stats():
+    """
+    WebSocket 연결 현황 조회 (요청을 받은 워커 기준)
+    """
+    return manager.get_stats()
+
 @router.websocket("/ws/chat")
 async def websocket_chat_endpoint(websocket: WebSocket):
     """
     WebSocket 스트리밍 채팅 엔드포인트
     """
-    await manager.connect(websocket)
-    db = SessionLocal()
+    state = await manager.connect(websocket)
+    if state is None:
+        return
     
     try:
         while True:
@@ -41,6 +164,9 @@ async def websocket_chat_endpoint(websocket: WebSocket):
             try:
                 request_data = json.loads(data)
                 
+                manager.touch(state)
+                state.busy = True
+                
                 # 요청 검증
                 message = request_data.get("message", "").strip()
                 style = request_data.get("style", "formal")
@@ -60,31 +186,36 @@ async def websocket_chat_endpoint(websocket: WebSocket):
                 except ValueError:
                     style_type = StyleType.FORMAL
                 
-                # 채팅 히스토리 조회
-                chat_history = chat_service.get_recent_history_for_context(db, session_id, limit=5)
-                
-                # 1단계: 문장 교정 (즉시 전송)
-                refined_text = await llm_service.refine_text(message, style_type)
-                
-                await manager.send_message(websocket, {
-                    "type": "refined",
-                    "content": refined_text,
-                    "session_id": session_id
-                })
-                
-                # 2단계: 응답 스트리밍
-                await manager.send_message(websocket, {
-                    "type": "reply_start",
-                    "content": "",
-                    "session_id": session_id
-                })
+                # 채팅 히스토리 조회 (오래된 턴은 프롬프트 빌더가 요약)
+                # DB 세션은 턴 단위로 짧게 사용하고 LLM 호출 중에는 잡고 있지 않음
+                with SessionLocal() as db:
+                    chat_history = chat_service.get_recent_history_for_context(db, session_id, limit=chat_service.max_history)
+                    summary = chat_service.get_history_summary(db, session_id)
                 
+                # 교정문을 먼저 전송한 뒤 응답 스트리밍 (통합 모드에서는 한 번의 호출)
+                refined_text = ""
                 reply_chunks = []
-                async for chunk in llm_service.stream_reply(refined_text, style_type, chat_history):
-                    reply_chunks.append(chunk)
+                async for event_type, content in llm_service.stream_refine_and_reply(message, style_type, chat_history, summary):
+                    if event_type == "refined":
+                        refined_text = content
+                        
+                        await manager.send_message(websocket, {
+                            "type": "refined",
+                            "content": refined_text,
+                            "session_id": session_id
+                        })
+                        
+                        await manager.send_message(websocket, {
+                            "type": "reply_start",
+                            "content": "",
+                            "session_id": session_id
+                        })
+                        continue
+                    
+                    reply_chunks.append(content)
                     await manager.send_message(websocket, {
                         "type": "reply_chunk",
-                        "content": chunk,
+                        "content": content,
                         "session_id": session_id
                     })
                 
@@ -97,14 +228,16 @@ async def websocket_chat_endpoint(websocket: WebSocket):
                     "session_id": session_id
                 })
                 
-                # 히스토리 저장
-                chat_service.save_chat_history(
-                    db=db,
-                    session_id=session_id,
-                    original_text=message,
-                    refined_text=refined_text,
-                    reply_text=reply_text
-                )
+                # 히스토리 및 갱신된 요약 저장
+                with SessionLocal() as db:
+                    chat_service.save_chat_history(
+                        db=db,
+                        session_id=session_id,
+                        original_text=message,
+                        refined_text=refined_text,
+                        reply_text=reply_text,
+                        summary=summary
+                    )
                 
                 await manager.send_message(websocket, {
                     "type": "done",
@@ -119,14 +252,20 @@ async def websocket_chat_endpoint(websocket: WebSocket):
                     "session_id": ""
                 })
                 
+            except WebSocketDisconnect:
+                raise
+                
             except Exception as e:
                 await manager.send_message(websocket, {
                     "type": "error",
                     "content": f"처리 중 오류가 발생했습니다: {str(e)}",
                     "session_id": session_id if 'session_id' in locals() else ""
                 })
+            
+            finally:
+                state.busy = False
                 
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
+        pass
     finally:
-        db.close()
\ No newline at end of file
+        manager.disconnect(websocket)
\ No newline at end of file
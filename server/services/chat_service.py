@@ -1,8 +1,12 @@
 import uuid
-from typing import List, Dict, Optional
+import base64
+import hashlib
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple
+from sqlalchemy import select, delete, and_, or_
 from sqlalchemy.orm import Session
-from models.database import ChatHistoryDB, get_db
-from models.schemas import ChatHistory
+from models.database import ChatHistoryDB, ChatSessionDB, get_db
+from models.schemas import ChatHistory, HistorySummary
 import os
 from dotenv import load_dotenv
 
@@ -11,14 +15,18 @@ load_dotenv()
 class ChatService:
     def __init__(self):
         self.max_history = int(os.getenv("MAX_CHAT_HISTORY", "10"))
+        # 세션별로 저장해 둘 최대 턴 수 (페이지네이션으로 조회 가능)
+        self.max_stored_history = int(os.getenv("MAX_STORED_CHAT_HISTORY", str(self.max_history)))
+        self.max_page_size = int(os.getenv("CHAT_HISTORY_MAX_PAGE_SIZE", "100"))
     
     def create_session_id(self) -> str:
         """새로운 세션 ID 생성"""
         return str(uuid.uuid4())
     
     def save_chat_history(self, db: Session, session_id: str, original_text: str, 
-                         refined_text: str, reply_text: str) -> ChatHistoryDB:
-        """채팅 히스토리 저장"""
+                         refined_text: str, reply_text: str,
+                         summary: Optional[HistorySummary] = None) -> ChatHistoryDB:
+        """채팅 히스토리 저장 (갱신된 히스토리 요약도 같은 트랜잭션에서 저장)"""
         chat_entry = ChatHistoryDB(
             session_id=session_id,
             original_text=original_text,
@@ -27,53 +35,144 @@ class ChatService:
         )
         
         db.add(chat_entry)
-        db.commit()
-        db.refresh(chat_entry)
+        db.flush()
         
-        # 최대 히스토리 수 제한
+        # 최대 히스토리 수 제한 (버전 증가와 같은 트랜잭션에서 처리)
         self._cleanup_old_history(db, session_id)
+        self._bump_version(db, session_id, summary)
+        db.commit()
+        db.refresh(chat_entry)
         
         return chat_entry
     
-    def get_chat_history(self, db: Session, session_id: str, limit: Optional[int] = None) -> List[Dict]:
-        """채팅 히스토리 조회"""
+    def get_history_summary(self, db: Session, session_id: str) -> HistorySummary:
+        """세션의 히스토리 요약 조회 (프롬프트 빌더에 넘길 용도)"""
+        session = db.get(ChatSessionDB, session_id)
+        if session is None or not session.summary:
+            return HistorySummary()
+        return HistorySummary(
+            summarized_until_id=session.summarized_until_id or 0,
+            lines=session.summary.split("\n")
+        )
+    
+    def get_session_version(self, db: Session, session_id: str) -> Tuple[int, Optional[datetime]]:
+        """세션 히스토리 버전 조회 (히스토리 행은 읽지 않음)"""
+        session = db.get(ChatSessionDB, session_id)
+        if session is None:
+            return 0, None
+        return session.version, session.updated_at
+    
+    def make_history_etag(self, db: Session, session_id: str, limit: int, cursor: Optional[str]) -> Tuple[str, bool]:
+        """세션 버전과 페이지 파라미터로 ETag 생성 - (ETag, 세션 존재 여부) 반환"""
+        version, updated_at = self.get_session_version(db, session_id)
+        stamp = updated_at.isoformat() if updated_at else ""
+        digest = hashlib.md5(f"{session_id}:{version}:{stamp}:{limit}:{cursor or ''}".encode("utf-8")).hexdigest()
+        return f'W/"{digest}"', updated_at is not None
+    
+    def get_chat_history_page(self, db: Session, session_id: str, limit: Optional[int] = None,
+                              cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """(created_at, id) 커서 기반 히스토리 페이지 조회
+        
+        cursor보다 오래된 턴을 최신순으로 limit개 가져와 시간순으로 반환하고,
+        더 오래된 턴이 있으면 다음 페이지 커서를 함께 반환
+        """
         if limit is None:
             limit = self.max_history
+        limit = max(1, min(limit, self.max_page_size))
         
-        histories = db.query(ChatHistoryDB)\
-                     .filter(ChatHistoryDB.session_id == session_id)\
-                     .order_by(ChatHistoryDB.created_at.desc())\
-                     .limit(limit)\
-                     .all()
+        # ORM 객체 생성 없이 컬럼 튜플로 조회
+        query = select(
+            ChatHistoryDB.id,
+            ChatHistoryDB.session_id,
+            ChatHistoryDB.original_text,
+            ChatHistoryDB.refined_text,
+            ChatHistoryDB.reply_text,
+            ChatHistoryDB.created_at
+        ).where(ChatHistoryDB.session_id == session_id)
+        
+        if cursor:
+            cursor_created_at, cursor_id = self.decode_cursor(cursor)
+            query = query.where(or_(
+                ChatHistoryDB.created_at < cursor_created_at,
+                and_(ChatHistoryDB.created_at == cursor_created_at, ChatHistoryDB.id < cursor_id)
+            ))
+        
+        rows = db.execute(
+            query.order_by(ChatHistoryDB.created_at.desc(), ChatHistoryDB.id.desc()).limit(limit + 1)
+        ).all()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self.encode_cursor(rows[-1].created_at, rows[-1].id)
         
         # 최신순으로 정렬된 것을 다시 시간순으로 뒤집음
-        histories.reverse()
+        rows.reverse()
         
-        return [
+        history = [
             {
-                "id": h.id,
-                "session_id": h.session_id,
-                "original_text": h.original_text,
-                "refined_text": h.refined_text,
-                "reply_text": h.reply_text,
-                "created_at": h.created_at.isoformat() if h.created_at else None
+                "id": row.id,
+                "session_id": row.session_id,
+                "original_text": row.original_text,
+                "refined_text": row.refined_text,
+                "reply_text": row.reply_text,
+                "created_at": row.created_at.isoformat() if row.created_at else None
             }
-            for h in histories
+            for row in rows
         ]
+        
+        return history, next_cursor
+    
+    def encode_cursor(self, created_at: datetime, entry_id: int) -> str:
+        """페이지 커서 인코딩"""
+        raw = f"{created_at.isoformat()}|{entry_id}"
+        return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+    
+    def decode_cursor(self, cursor: str) -> Tuple[datetime, int]:
+        """페이지 커서 디코딩 (잘못된 커서는 ValueError)"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+            created_at, entry_id = raw.split("|", 1)
+            return datetime.fromisoformat(created_at), int(entry_id)
+        except (ValueError, UnicodeError) as e:
+            raise ValueError(f"잘못된 커서입니다: {cursor}") from e
+    
+    def _bump_version(self, db: Session, session_id: str, summary: Optional[HistorySummary] = None):
+        """세션 히스토리 버전 증가"""
+        session = db.get(ChatSessionDB, session_id)
+        if session is None:
+            session = ChatSessionDB(session_id=session_id, version=0)
+            db.add(session)
+        session.version = (session.version or 0) + 1
+        session.updated_at = datetime.utcnow()
+        
+        if summary is not None:
+            session.summarized_until_id = summary.summarized_until_id
+            session.summary = "\n".join(summary.lines)
     
     def _cleanup_old_history(self, db: Session, session_id: str):
         """오래된 히스토리 정리"""
-        # 최신 N개만 유지하고 나머지는 삭제
-        histories = db.query(ChatHistoryDB)\
-                     .filter(ChatHistoryDB.session_id == session_id)\
-                     .order_by(ChatHistoryDB.created_at.desc())\
-                     .all()
+        # 최신 N번째 턴의 (created_at, id)를 인덱스로 찾고, 그보다 오래된 턴을 한 번에 삭제
+        boundary = db.execute(
+            select(ChatHistoryDB.created_at, ChatHistoryDB.id)
+            .where(ChatHistoryDB.session_id == session_id)
+            .order_by(ChatHistoryDB.created_at.desc(), ChatHistoryDB.id.desc())
+            .offset(self.max_stored_history - 1)
+            .limit(1)
+        ).first()
+        
+        if boundary is None:
+            return
         
-        if len(histories) > self.max_history:
-            old_histories = histories[self.max_history:]
-            for old_history in old_histories:
-                db.delete(old_history)
-            db.commit()
+        db.execute(
+            delete(ChatHistoryDB)
+            .where(ChatHistoryDB.session_id == session_id)
+            .where(or_(
+                ChatHistoryDB.created_at < boundary.created_at,
+                and_(ChatHistoryDB.created_at == boundary.created_at, ChatHistoryDB.id < boundary.id)
+            ))
+            .execution_options(synchronize_session=False)
+        )
     
     def get_recent_history_for_context(self, db: Session, session_id: str, limit: int = 5) -> List[Dict]:
         """컨텍스트용 최근 히스토리 조회 (간소화된 형태)"""
@@ -87,6 +186,7 @@ class ChatService:
         
         return [
             {
+                "id": h.id,
                 "refined_text": h.refined_text,
                 "reply_text": h.reply_text
             }
@@ -1,18 +1,24 @@
 import os
-from typing import List, Dict, AsyncGenerator
+from typing import List, Dict, AsyncGenerator, Tuple, Optional
 from langchain_openai import ChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage, AIMessage
 from dotenv import load_dotenv
-from models.schemas import StyleType
-from services.rag_service import rag_service
+from models.schemas import StyleType, HistorySummary
+from services.rag_client import rag_client
+from services.prompt_builder import prompt_builder
 from utils.profanity_filter import profanity_filter
 
 load_dotenv()
 
+# 통합 모드에서 교정문과 응답을 구분하는 구분자
+COMBINED_DELIMITER = "<<<REPLY>>>"
+
 class LLMService:
     def __init__(self):
         self.api_key = os.getenv("OPENAI_API_KEY")
         self.model_name = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+        # 교정과 응답을 한 번의 호출로 처리할지 여부
+        self.combined_mode = os.getenv("LLM_COMBINED_MODE", "false").lower() == "true"
         
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY가 설정되지 않았습니다.")
@@ -31,7 +37,10 @@ class LLMService:
             StyleType.CASUAL: "자연스럽고 친근한 말투로"
         }
         
-        return f"""당신은 한국어 문장 교정 전문가입니다. 유학생이 작성한 한국어 문장을 자연스럽게 교정해주세요.
+        # 사용자 문장 토큰 예산 적용
+        user_text = prompt_builder.build_user_text(original_text)
+        
+        prompt = f"""당신은 한국어 문장 교정 전문가입니다. 유학생이 작성한 한국어 문장을 자연스럽게 교정해주세요.
 
 {examples}
 
@@ -42,27 +51,26 @@ class LLMService:
 4. 원래 의미는 그대로 유지
 5. 교정된 문장만 출력하세요 (설명 없이)
 
-교정할 문장: {original_text}
+교정할 문장: {user_text}
 
 교정된 문장:"""
+        
+        prompt_builder.record("refine", {"examples": examples, "user_text": user_text}, prompt)
+        return prompt
     
-    def get_reply_prompt(self, refined_text: str, style: StyleType, chat_history: List[Dict]) -> str:
+    def get_reply_prompt(self, refined_text: str, style: StyleType, chat_history: List[Dict],
+                         summary: Optional[HistorySummary] = None) -> str:
         """응답 생성을 위한 프롬프트 생성"""
         style_instruction = {
             StyleType.FORMAL: "정중하고 도움이 되는 존댓말로",
             StyleType.CASUAL: "친근하고 자연스러운 말투로"
         }
         
-        # 채팅 히스토리 컨텍스트 생성
-        history_context = ""
-        if chat_history:
-            history_context = "이전 대화 내용:\n"
-            for entry in chat_history[-5:]:  # 최근 5턴만 포함
-                history_context += f"사용자: {entry['refined_text']}\n"
-                history_context += f"봇: {entry['reply_text']}\n"
-            history_context += "\n"
+        # 채팅 히스토리 컨텍스트 생성 (토큰 예산 적용, 오래된 턴은 요약)
+        history_context = prompt_builder.build_history(chat_history, summary)
+        user_text = prompt_builder.build_user_text(refined_text)
         
-        return f"""당신은 유학생을 도와주는 친근한 한국어 대화 파트너입니다.
+        prompt = f"""당신은 유학생을 도와주는 친근한 한국어 대화 파트너입니다.
 
 {history_context}사용자가 교정된 문장으로 대화를 시작했습니다. {style_instruction[style]} 자연스럽게 응답해주세요.
 
@@ -73,9 +81,57 @@ class LLMService:
 4. 너무 길지 않게 (2-3문장 정도)
 5. 한국 문화나 언어에 대한 팁이 있다면 자연스럽게 포함
 
-사용자 메시지: {refined_text}
+사용자 메시지: {user_text}
 
 응답:"""
+        
+        prompt_builder.record("reply", {"history": history_context, "user_text": user_text}, prompt)
+        return prompt
+    
+    def get_combined_prompt(self, original_text: str, examples: str, style: StyleType, chat_history: List[Dict],
+                            summary: Optional[HistorySummary] = None) -> str:
+        """교정과 응답을 한 번에 생성하기 위한 프롬프트 생성"""
+        refine_style = {
+            StyleType.FORMAL: "존댓말과 정중한 표현을 사용하여",
+            StyleType.CASUAL: "자연스럽고 친근한 말투로"
+        }
+        reply_style = {
+            StyleType.FORMAL: "정중하고 도움이 되는 존댓말로",
+            StyleType.CASUAL: "친근하고 자연스러운 말투로"
+        }
+        
+        # 채팅 히스토리 컨텍스트 생성 (토큰 예산 적용, 오래된 턴은 요약)
+        history_context = prompt_builder.build_history(chat_history, summary)
+        user_text = prompt_builder.build_user_text(original_text)
+        
+        prompt = f"""당신은 유학생을 도와주는 한국어 문장 교정 전문가이자 친근한 대화 파트너입니다.
+유학생이 작성한 문장을 먼저 교정한 뒤, 교정된 문장에 대해 응답해주세요.
+
+{examples}
+{history_context}교정 지침:
+1. {refine_style[style]} 교정해주세요
+2. 맞춤법, 띄어쓰기, 문법을 정확하게 수정
+3. 자연스러운 한국어 표현으로 개선
+4. 원래 의미는 그대로 유지
+
+응답 지침:
+1. {reply_style[style]} 상황에 맞게 반응
+2. 대화를 이어갈 수 있는 내용
+3. 유학생에게 도움이 되는 방향
+4. 너무 길지 않게 (2-3문장 정도)
+5. 한국 문화나 언어에 대한 팁이 있다면 자연스럽게 포함
+
+출력 형식 (반드시 지켜주세요):
+첫 줄에 교정된 문장만 출력하고 (설명 없이), 다음 줄에 {COMBINED_DELIMITER} 를 출력한 뒤, 그 다음 줄부터 응답을 출력하세요.
+
+교정할 문장: {user_text}"""
+        
+        prompt_builder.record(
+            "combined",
+            {"examples": examples, "history": history_context, "user_text": user_text},
+            prompt
+        )
+        return prompt
     
     async def refine_text(self, original_text: str, style: StyleType) -> str:
         """문장 교정"""
@@ -83,8 +139,8 @@ class LLMService:
         if not profanity_filter.is_safe(original_text):
             return "죄송합니다. 부적절한 내용이 포함되어 있어 교정할 수 없습니다."
         
-        # RAG로 유사한 예시 검색
-        examples = rag_service.get_refinement_examples(original_text, k=3)
+        # RAG로 유사한 예시 검색 (토큰 예산 적용)
+        examples = prompt_builder.build_examples(await rag_client.search_similar_examples(original_text, k=3))
         
         # 프롬프트 생성
         prompt = self.get_refinement_prompt(original_text, examples, style)
@@ -101,13 +157,14 @@ class LLMService:
         
         return refined_text
     
-    async def generate_reply(self, refined_text: str, style: StyleType, chat_history: List[Dict] = None) -> str:
+    async def generate_reply(self, refined_text: str, style: StyleType, chat_history: List[Dict] = None,
+                             summary: Optional[HistorySummary] = None) -> str:
         """응답 생성"""
         if chat_history is None:
             chat_history = []
         
         # 프롬프트 생성
-        prompt = self.get_reply_prompt(refined_text, style, chat_history)
+        prompt = self.get_reply_prompt(refined_text, style, chat_history, summary)
         
         # LLM 호출
         messages = [SystemMessage(content=prompt)]
@@ -121,13 +178,14 @@ class LLMService:
         
         return reply_text
     
-    async def stream_reply(self, refined_text: str, style: StyleType, chat_history: List[Dict] = None) -> AsyncGenerator[str, None]:
+    async def stream_reply(self, refined_text: str, style: StyleType, chat_history: List[Dict] = None,
+                           summary: Optional[HistorySummary] = None) -> AsyncGenerator[str, None]:
         """스트리밍 응답 생성"""
         if chat_history is None:
             chat_history = []
         
         # 프롬프트 생성
-        prompt = self.get_reply_prompt(refined_text, style, chat_history)
+        prompt = self.get_reply_prompt(refined_text, style, chat_history, summary)
         
         # 스트리밍 LLM 호출
         messages = [SystemMessage(content=prompt)]
@@ -137,6 +195,105 @@ class LLMService:
                 # 간단한 실시간 금칙어 필터링 (완벽하지 않음)
                 filtered_content = profanity_filter.filter_text(chunk.content)
                 yield filtered_content
+    
+    async def stream_refine_and_reply(self, original_text: str, style: StyleType,
+                                      chat_history: List[Dict] = None,
+                                      summary: Optional[HistorySummary] = None) -> AsyncGenerator[Tuple[str, str], None]:
+        """교정 및 응답 스트리밍 - ("refined", 교정문) 이후 ("reply_chunk", 조각)을 순서대로 생성"""
+        if chat_history is None:
+            chat_history = []
+        
+        # 통합 모드가 아니거나 금칙어가 포함된 경우 기존 2단계 처리
+        if not self.combined_mode or not profanity_filter.is_safe(original_text):
+            refined_text = await self.refine_text(original_text, style)
+            yield "refined", refined_text
+            async for chunk in self.stream_reply(refined_text, style, chat_history, summary):
+                yield "reply_chunk", chunk
+            return
+        
+        # RAG로 유사한 예시 검색 (토큰 예산 적용)
+        examples = prompt_builder.build_examples(await rag_client.search_similar_examples(original_text, k=3))
+        
+        # 프롬프트 생성
+        prompt = self.get_combined_prompt(original_text, examples, style, chat_history, summary)
+        messages = [SystemMessage(content=prompt)]
+        
+        # 구분자가 나올 때까지 버퍼링한 뒤 교정문을 먼저 내보냄
+        buffer = ""
+        refined_text = None
+        reply_sent = False
+        
+        async for chunk in self.llm.astream(messages):
+            if not chunk.content:
+                continue
+            
+            if reply_sent:
+                yield "reply_chunk", profanity_filter.filter_text(chunk.content)
+                continue
+            
+            buffer += chunk.content
+            if refined_text is None:
+                if COMBINED_DELIMITER not in buffer:
+                    continue
+                refined_part, buffer = buffer.split(COMBINED_DELIMITER, 1)
+                refined_text = self._filter_refined(refined_part)
+                yield "refined", refined_text
+            
+            # 응답 앞의 공백은 실제 내용이 나올 때까지 보류
+            buffer = buffer.lstrip()
+            if buffer:
+                yield "reply_chunk", profanity_filter.filter_text(buffer)
+                reply_sent = True
+        
+        if reply_sent:
+            return
+        
+        # 구분자가 없으면 첫 줄을 교정문, 나머지를 응답으로 사용
+        if refined_text is None:
+            refined_part, _, reply_part = buffer.strip().partition("\n")
+            refined_text = self._filter_refined(refined_part)
+            yield "refined", refined_text
+            
+            reply_part = reply_part.strip()
+            if reply_part:
+                yield "reply_chunk", profanity_filter.filter_text(reply_part)
+                return
+        
+        # 응답이 비어 있을 때만 응답을 따로 생성
+        async for chunk in self.stream_reply(refined_text, style, chat_history, summary):
+            yield "reply_chunk", chunk
+    
+    async def refine_and_reply(self, original_text: str, style: StyleType,
+                               chat_history: List[Dict] = None,
+                               summary: Optional[HistorySummary] = None) -> Tuple[str, str]:
+        """교정 및 응답 생성 - (교정문, 응답) 반환"""
+        if not self.combined_mode:
+            refined_text = await self.refine_text(original_text, style)
+            reply_text = await self.generate_reply(refined_text, style, chat_history, summary)
+            return refined_text, reply_text
+        
+        refined_text = ""
+        reply_chunks = []
+        async for event_type, content in self.stream_refine_and_reply(original_text, style, chat_history, summary):
+            if event_type == "refined":
+                refined_text = content
+            else:
+                reply_chunks.append(content)
+        
+        reply_text = "".join(reply_chunks).strip()
+        
+        # 금칙어 필터링
+        if not profanity_filter.is_safe(reply_text):
+            reply_text = profanity_filter.filter_text(reply_text)
+        
+        return refined_text, reply_text
+    
+    def _filter_refined(self, text: str) -> str:
+        """교정문 정리 및 금칙어 필터링"""
+        refined_text = text.strip()
+        if not profanity_filter.is_safe(refined_text):
+            refined_text = profanity_filter.filter_text(refined_text)
+        return refined_text
 
 # 전역 LLM 서비스 인스턴스
 llm_service = LLMService()
\ No newline at end of file
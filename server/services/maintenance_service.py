@@ -0,0 +1,221 @@
+import os
+import time
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from models.database import ChatHistoryDB, ChatSessionDB, MaintenanceRunDB, SessionLocal, engine
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+load_dotenv()
+
+class MaintenanceService:
+    """chat_history 보존 기간 정리 및 SQLite 파일 압축 백그라운드 작업"""
+
+    def __init__(self):
+        self.enabled = os.getenv("DB_MAINTENANCE_ENABLED", "true").lower() == "true"
+        self.ttl_days = float(os.getenv("CHAT_HISTORY_TTL_DAYS", "30"))
+        self.interval = float(os.getenv("DB_MAINTENANCE_INTERVAL", "3600"))
+        self.batch_size = int(os.getenv("DB_MAINTENANCE_BATCH_SIZE", "200"))
+        self.max_batches = int(os.getenv("DB_MAINTENANCE_MAX_BATCHES", "50"))
+        self.batch_pause = float(os.getenv("DB_MAINTENANCE_BATCH_PAUSE", "0.1"))
+        self.vacuum_pages = int(os.getenv("DB_MAINTENANCE_VACUUM_PAGES", "1000"))
+
+        self.is_sqlite = engine.dialect.name == "sqlite"
+        self.db_path = engine.url.database if self.is_sqlite else None
+
+        # 보관할 실행 기록 수 (파일 크기 추이 조회용)
+        self.history_size = int(os.getenv("DB_MAINTENANCE_HISTORY_SIZE", "48"))
+
+        self._task: Optional[asyncio.Task] = None
+        self._lock_file = None
+
+    def start(self):
+        """백그라운드 작업 시작 (멀티 워커에서는 파일 락을 잡은 워커 하나만 실행)"""
+        if not self.enabled or self._task is not None:
+            return False
+        if not self._acquire_lock():
+            return False
+
+        self._task = asyncio.create_task(self.run_forever())
+        return True
+
+    async def stop(self):
+        """백그라운드 작업 중지"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    async def run_forever(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"⚠️  DB 정리 작업 실패: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def run_once(self) -> Dict:
+        """만료 세션 삭제 및 파일 압축 1회 실행"""
+        started = time.monotonic()
+        cutoff = datetime.utcnow() - timedelta(days=self.ttl_days)
+        sessions_removed = 0
+        rows_removed = 0
+
+        # 한 번에 batch_size 세션씩 삭제하고, 배치 사이마다 이벤트 루프에 양보
+        for _ in range(self.max_batches):
+            session_ids, rows = await asyncio.to_thread(self._delete_expired_batch, cutoff)
+            sessions_removed += len(session_ids)
+            rows_removed += rows
+
+            if len(session_ids) < self.batch_size:
+                break
+            await asyncio.sleep(self.batch_pause)
+
+        await asyncio.to_thread(self._compact)
+
+        size = self._file_size()
+        run = {
+            "sessions_removed": sessions_removed,
+            "rows_removed": rows_removed,
+            "duration_ms": int((time.monotonic() - started) * 1000),
+            **size
+        }
+        await asyncio.to_thread(self._save_run, run)
+
+        print(f"🧹 DB 정리 완료: 세션 {sessions_removed}개, 행 {rows_removed}개 삭제 "
+              f"(DB {size['db_bytes']} bytes, WAL {size['wal_bytes']} bytes)")
+        return run
+
+    def get_stats(self, db) -> Dict:
+        """정리 작업 현황 조회 (실행 기록은 DB에 저장되어 모든 워커에서 같은 결과)"""
+        history = db.query(MaintenanceRunDB)\
+                    .order_by(MaintenanceRunDB.id.desc())\
+                    .limit(self.history_size)\
+                    .all()
+        last = history[0] if history else None
+        history.reverse()
+
+        size_history = [
+            {
+                "timestamp": run.created_at.isoformat() if run.created_at else None,
+                "sessions_removed": run.sessions_removed,
+                "rows_removed": run.rows_removed,
+                "duration_ms": run.duration_ms,
+                "db_bytes": run.db_bytes,
+                "wal_bytes": run.wal_bytes
+            }
+            for run in history
+        ]
+
+        return {
+            "enabled": self.enabled,
+            "ttl_days": self.ttl_days,
+            "interval": self.interval,
+            "runs": last.id if last else 0,
+            "sessions_removed_total": last.sessions_removed_total if last else 0,
+            "rows_removed_total": last.rows_removed_total if last else 0,
+            "last_run": size_history[-1] if size_history else None,
+            "history": size_history
+        }
+
+    def _save_run(self, run: Dict):
+        """실행 기록 저장 및 오래된 기록 정리"""
+        with SessionLocal() as db:
+            previous = db.query(MaintenanceRunDB).order_by(MaintenanceRunDB.id.desc()).first()
+            db.add(MaintenanceRunDB(
+                **run,
+                sessions_removed_total=(previous.sessions_removed_total if previous else 0) + run["sessions_removed"],
+                rows_removed_total=(previous.rows_removed_total if previous else 0) + run["rows_removed"]
+            ))
+            db.flush()
+
+            keep_from = db.query(MaintenanceRunDB.id)\
+                          .order_by(MaintenanceRunDB.id.desc())\
+                          .offset(self.history_size - 1)\
+                          .limit(1)\
+                          .scalar()
+            if keep_from is not None:
+                db.query(MaintenanceRunDB)\
+                  .filter(MaintenanceRunDB.id < keep_from)\
+                  .delete(synchronize_session=False)
+            db.commit()
+
+    def _delete_expired_batch(self, cutoff: datetime) -> Tuple[List[str], int]:
+        """마지막 대화가 cutoff 이전인 세션을 최대 batch_size개 삭제"""
+        with SessionLocal() as db:
+            # chat_sessions.updated_at 인덱스로 만료 세션만 읽음 (chat_history 전체를 훑지 않음)
+            expired = db.query(ChatSessionDB.session_id)\
+                        .filter(ChatSessionDB.updated_at < cutoff)\
+                        .order_by(ChatSessionDB.updated_at)\
+                        .limit(self.batch_size)\
+                        .all()
+            session_ids = [row[0] for row in expired]
+
+            if not session_ids:
+                return [], 0
+
+            rows = db.query(ChatHistoryDB)\
+                     .filter(ChatHistoryDB.session_id.in_(session_ids))\
+                     .delete(synchronize_session=False)
+            db.query(ChatSessionDB)\
+              .filter(ChatSessionDB.session_id.in_(session_ids))\
+              .delete(synchronize_session=False)
+            db.commit()
+
+        return session_ids, rows
+
+    def _compact(self):
+        """WAL 체크포인트 및 incremental vacuum으로 빈 페이지 반환"""
+        if not self.is_sqlite:
+            return
+
+        with engine.connect() as conn:
+            # auto_vacuum=INCREMENTAL(2)인 DB에서만 동작
+            # sqlite3의 execute()는 한 스텝(한 페이지)만 실행하므로 executescript()로 끝까지 실행
+            if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+                conn.commit()
+                conn.connection.executescript(f"PRAGMA incremental_vacuum({self.vacuum_pages});")
+
+            journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+            if str(journal_mode).lower() == "wal":
+                conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+
+    def _file_size(self) -> Dict[str, int]:
+        if not self.db_path or not os.path.exists(self.db_path):
+            return {"db_bytes": 0, "wal_bytes": 0}
+
+        wal_path = f"{self.db_path}-wal"
+        return {
+            "db_bytes": os.path.getsize(self.db_path),
+            "wal_bytes": os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+        }
+
+    def _acquire_lock(self) -> bool:
+        if fcntl is None:
+            return True
+
+        lock_path = f"{self.db_path}.maintenance.lock" if self.db_path else "/tmp/chat_history.maintenance.lock"
+        lock_file = open(lock_path, "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+
+        self._lock_file = lock_file
+        return True
+
+# 전역 DB 정리 서비스 인스턴스
+maintenance_service = MaintenanceService()
@@ -0,0 +1,221 @@
+import os
+from typing import List, Dict, Tuple, Optional
+import tiktoken
+from dotenv import load_dotenv
+from models.schemas import HistorySummary
+
+load_dotenv()
+
+class PromptBuilder:
+    def __init__(self):
+        self.model_name = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+        # 섹션별 토큰 예산
+        self.examples_budget = int(os.getenv("PROMPT_EXAMPLES_TOKEN_BUDGET", "300"))
+        self.history_budget = int(os.getenv("PROMPT_HISTORY_TOKEN_BUDGET", "500"))
+        self.summary_budget = int(os.getenv("PROMPT_SUMMARY_TOKEN_BUDGET", "150"))
+        self.user_text_budget = int(os.getenv("PROMPT_USER_TOKEN_BUDGET", "200"))
+
+        # 원문 그대로 포함할 최근 대화 턴 수 및 요약 시 턴별 최대 토큰
+        self.history_turns = int(os.getenv("PROMPT_HISTORY_TURNS", "5"))
+        self.summary_turn_tokens = int(os.getenv("PROMPT_SUMMARY_TURN_TOKENS", "30"))
+
+        # 단계별 프롬프트 토큰 통계
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+        self._encoding = None
+        self._encoding_failed = False
+
+    def load_encoding(self):
+        """토크나이저 로드 (시작 시 한 번 호출, 실패하면 길이 기반 추정으로 대체)
+
+        tiktoken은 처음 사용할 때 인코딩 파일을 내려받으므로
+        TIKTOKEN_CACHE_DIR에 미리 캐시해 두어야 네트워크 없이 동작함
+        """
+        if self._encoding is None and not self._encoding_failed:
+            try:
+                try:
+                    self._encoding = tiktoken.encoding_for_model(self.model_name)
+                except KeyError:
+                    self._encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                self._encoding_failed = True
+                print(f"⚠️  토크나이저 로드 실패, 길이 기반 추정 사용: {e}")
+        return self._encoding
+
+    def count_tokens(self, text: str) -> int:
+        """텍스트의 토큰 수 계산"""
+        if not text:
+            return 0
+        encoding = self.load_encoding()
+        if encoding is None:
+            return self._estimate_tokens(text)
+        return len(encoding.encode(text))
+
+    def truncate(self, text: str, budget: int) -> str:
+        """토큰 예산에 맞게 텍스트 자르기"""
+        encoding = self.load_encoding()
+        if encoding is None:
+            return self._estimate_truncate(text, budget)
+
+        tokens = encoding.encode(text)
+        if len(tokens) <= budget:
+            return text
+
+        # 바이트 단위 BPE라 한글 한 글자가 여러 토큰에 걸칠 수 있으므로
+        # 온전히 디코딩되는 토큰 경계까지 물러나서 자름 (U+FFFD 방지)
+        tokens = tokens[:budget]
+        while tokens:
+            try:
+                return encoding.decode_bytes(tokens).decode("utf-8") + "…"
+            except UnicodeDecodeError:
+                tokens = tokens[:-1]
+        return "…"
+
+    def build_user_text(self, text: str) -> str:
+        """사용자 문장을 예산 내로 제한"""
+        return self.truncate(text, self.user_text_budget)
+
+    def build_examples(self, similar_examples: List[Tuple[str, str, float]]) -> str:
+        """예산 내에서 교정 예시 컨텍스트 생성"""
+        if not similar_examples:
+            return ""
+
+        examples_text = "다음은 한국어 문장 교정 예시들입니다:\n\n"
+        used = self.count_tokens(examples_text)
+        included = 0
+
+        for original, refined, score in similar_examples:
+            example = f"예시 {included + 1}:\n원문: {original}\n교정: {refined}\n\n"
+            cost = self.count_tokens(example)
+            if used + cost > self.examples_budget:
+                break
+            examples_text += example
+            used += cost
+            included += 1
+
+        return examples_text if included else ""
+
+    def build_history(self, chat_history: List[Dict], summary: Optional[HistorySummary] = None) -> str:
+        """예산 내에서 히스토리 컨텍스트 생성 (오래된 턴은 요약으로 압축)
+
+        summary는 호출한 쪽이 DB에서 읽어 넘기고, 새로 요약된 턴이 있으면 여기서 갱신됨
+        """
+        if not chat_history:
+            return ""
+
+        if summary is None:
+            summary = HistorySummary()
+        last_summarized_id, summary_lines = summary.summarized_until_id, summary.lines
+
+        # 이미 요약된 턴은 원문에서 제외
+        pending = [entry for entry in chat_history
+                   if entry.get("id") is None or entry["id"] > last_summarized_id]
+
+        # 최신 턴부터 예산이 허용하는 만큼 원문 그대로 포함
+        recent_lines: List[str] = []
+        used = 0
+        split = len(pending)
+        for i in range(len(pending) - 1, -1, -1):
+            if len(recent_lines) >= self.history_turns:
+                break
+            entry = pending[i]
+            turn = f"사용자: {entry['refined_text']}\n봇: {entry['reply_text']}\n"
+            cost = self.count_tokens(turn)
+            if used + cost > self.history_budget:
+                break
+            recent_lines.insert(0, turn)
+            used += cost
+            split = i
+
+        # 예산 밖으로 밀려난 턴은 요약에 추가 (세션당 한 번만 계산)
+        older = pending[:split]
+        if older:
+            summary_lines = summary_lines + [self._summarize_turn(entry) for entry in older]
+            summary_lines = self._trim_summary(summary_lines)
+            if older[-1].get("id") is not None:
+                summary.summarized_until_id = older[-1]["id"]
+            summary.lines = summary_lines
+
+        history_context = ""
+        if summary_lines:
+            history_context += "이전 대화 요약:\n" + "\n".join(summary_lines) + "\n\n"
+        if recent_lines:
+            history_context += "이전 대화 내용:\n" + "".join(recent_lines) + "\n"
+
+        return history_context
+
+    def record(self, stage: str, sections: Dict[str, str], prompt: str) -> Dict[str, int]:
+        """단계별 프롬프트 토큰 수 기록"""
+        counts = {name: self.count_tokens(text) for name, text in sections.items()}
+        counts["total"] = self.count_tokens(prompt)
+
+        stats = self._stats.setdefault(stage, {"calls": 0, "total_tokens": 0, "max_tokens": 0})
+        stats["calls"] += 1
+        stats["total_tokens"] += counts["total"]
+        stats["max_tokens"] = max(stats["max_tokens"], counts["total"])
+        for name, count in counts.items():
+            if name != "total":
+                key = f"{name}_tokens"
+                stats[key] = stats.get(key, 0) + count
+
+        return counts
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """단계별 프롬프트 토큰 통계 조회"""
+        result = {}
+        for stage, stats in self._stats.items():
+            calls = stats["calls"] or 1
+            result[stage] = {
+                "calls": stats["calls"],
+                "max_tokens": stats["max_tokens"],
+                "avg_tokens": {
+                    key[:-len("_tokens")]: round(value / calls, 1)
+                    for key, value in stats.items()
+                    if key.endswith("_tokens") and key != "max_tokens"
+                }
+            }
+        return {
+            "budgets": {
+                "examples": self.examples_budget,
+                "history": self.history_budget,
+                "summary": self.summary_budget,
+                "user_text": self.user_text_budget
+            },
+            "stages": result
+        }
+
+    def _summarize_turn(self, entry: Dict) -> str:
+        """턴 하나를 짧은 요약 줄로 압축"""
+        user = self.truncate(entry["refined_text"], self.summary_turn_tokens)
+        bot = self.truncate(entry["reply_text"], self.summary_turn_tokens)
+        return f"- 사용자: {user} / 봇: {bot}"
+
+    def _trim_summary(self, summary_lines: List[str]) -> List[str]:
+        """요약 예산을 넘으면 가장 오래된 줄부터 제거"""
+        costs = [self.count_tokens(line) for line in summary_lines]
+        total = sum(costs)
+        start = 0
+        while total > self.summary_budget and start < len(summary_lines):
+            total -= costs[start]
+            start += 1
+        return summary_lines[start:]
+
+    def _estimate_tokens(self, text: str) -> int:
+        """토크나이저 없이 토큰 수 추정 (UTF-8 3바이트당 1토큰, 한글은 글자당 약 1토큰)"""
+        return (len(text.encode("utf-8")) + 2) // 3
+
+    def _estimate_truncate(self, text: str, budget: int) -> str:
+        if self._estimate_tokens(text) <= budget:
+            return text
+
+        limit = budget * 3
+        used = 0
+        for i, char in enumerate(text):
+            used += len(char.encode("utf-8"))
+            if used > limit:
+                return text[:i] + "…"
+        return text
+
+# 전역 프롬프트 빌더 인스턴스
+prompt_builder = PromptBuilder()
@@ -0,0 +1,93 @@
+import os
+import json
+import asyncio
+from typing import List, Tuple, Dict, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class RAGClient:
+    """RAG 검색 비동기 클라이언트
+
+    RAG_SIDECAR_SOCKET이 설정되어 있으면 유닉스 소켓으로 사이드카 프로세스에 요청하고,
+    없으면 같은 프로세스의 RAGService를 스레드에서 호출합니다.
+    """
+
+    def __init__(self):
+        self.socket_path = os.getenv("RAG_SIDECAR_SOCKET")
+        self.timeout = float(os.getenv("RAG_SIDECAR_TIMEOUT", "10"))
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._connect_lock = asyncio.Lock()
+
+    async def search_similar_examples(self, query: str, k: int = 3) -> List[Tuple[str, str, float]]:
+        """유사한 예시 검색"""
+        if not self.socket_path:
+            # 단일 프로세스 모드: 임베딩 모델을 이 프로세스에서 로드
+            from services.rag_service import rag_service
+            return await asyncio.to_thread(rag_service.search_similar_examples, query, k)
+
+        writer = await self._connect()
+
+        self._next_id += 1
+        request_id = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+
+        try:
+            request = {"id": request_id, "query": query, "k": k}
+            writer.write((json.dumps(request, ensure_ascii=False) + "\n").encode("utf-8"))
+            await writer.drain()
+            return await asyncio.wait_for(future, self.timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def close(self):
+        """사이드카 연결 종료"""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+
+    async def _connect(self) -> asyncio.StreamWriter:
+        """사이드카 연결 (워커당 하나의 연결을 재사용)"""
+        async with self._connect_lock:
+            if self._writer is None or self._writer.is_closing():
+                self._reader, self._writer = await asyncio.open_unix_connection(self.socket_path)
+                self._reader_task = asyncio.create_task(self._read_responses(self._reader, self._writer))
+            return self._writer
+
+    async def _read_responses(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """응답을 읽어 요청 ID별 대기 중인 Future에 전달"""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                response = json.loads(line)
+                future = self._pending.pop(response["id"], None)
+                if future is None or future.done():
+                    continue
+
+                if "error" in response:
+                    future.set_exception(RuntimeError(response["error"]))
+                else:
+                    future.set_result([tuple(result) for result in response["results"]])
+        finally:
+            # 연결이 끊어지면 대기 중인 요청을 모두 실패 처리
+            if self._writer is writer:
+                self._writer = None
+            writer.close()
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("RAG 사이드카 연결이 끊어졌습니다."))
+            self._pending.clear()
+
+# 전역 RAG 클라이언트 인스턴스
+rag_client = RAGClient()
@@ -42,37 +42,29 @@ class RAGService:
     
     def search_similar_examples(self, query: str, k: int = 3) -> List[Tuple[str, str, float]]:
         """유사한 예시 검색"""
+        return self.search_similar_examples_batch([query], k)[0]
+    
+    def search_similar_examples_batch(self, queries: List[str], k: int = 3) -> List[List[Tuple[str, str, float]]]:
+        """여러 쿼리에 대한 유사한 예시 일괄 검색"""
         model = self.load_model()
         index, texts = self.load_index()
         
-        # 쿼리 임베딩
-        query_embedding = model.encode([query])
+        # 쿼리 임베딩 (한 번에 인코딩)
+        query_embeddings = model.encode(queries)
         
         # FAISS 검색
-        scores, indices = index.search(query_embedding.astype('float32'), k)
-        
-        results = []
-        for i, (score, idx) in enumerate(zip(scores[0], indices[0])):
-            if idx < len(texts):
-                original, refined = texts[idx]
-                results.append((original, refined, float(score)))
-        
-        return results
-    
-    def get_refinement_examples(self, query: str, k: int = 3) -> str:
-        """교정 예시를 위한 컨텍스트 생성"""
-        similar_examples = self.search_similar_examples(query, k)
-        
-        if not similar_examples:
-            return ""
+        scores, indices = index.search(query_embeddings.astype('float32'), k)
         
-        examples_text = "다음은 한국어 문장 교정 예시들입니다:\n\n"
-        for i, (original, refined, score) in enumerate(similar_examples, 1):
-            examples_text += f"예시 {i}:\n"
-            examples_text += f"원문: {original}\n"
-            examples_text += f"교정: {refined}\n\n"
+        batch_results = []
+        for query_scores, query_indices in zip(scores, indices):
+            results = []
+            for score, idx in zip(query_scores, query_indices):
+                if 0 <= idx < len(texts):
+                    original, refined = texts[idx]
+                    results.append((original, refined, float(score)))
+            batch_results.append(results)
         
-        return examples_text
+        return batch_results
 
 # 전역 RAG 서비스 인스턴스
 rag_service = RAGService()
\ No newline at end of file